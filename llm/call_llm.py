@@ -3,6 +3,21 @@ from config.config import get_openai_api_key
 
 import openai
 
+# Prefixes of the messages returned instead of a response when the LLM call fails
+ERROR_PREFIXES = ("An error occurred while processing your request:", "An unexpected error occurred:")
+
+def is_llm_error(response):
+    """
+    Check whether a value returned by call_llm is an error message.
+
+    Args:
+        response (str): The value returned by call_llm.
+
+    Returns:
+        bool: True if the call failed and the response is an error message.
+    """
+    return response.startswith(ERROR_PREFIXES)
+
 def call_llm(prompt, model="gpt-3.5-turbo", max_tokens=200):
     """
     Centralized method to call GPT-3.5 Turbo with a given prompt.
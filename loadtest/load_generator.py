@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import math
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.call_llm import ERROR_PREFIXES, is_llm_error
+from loadtest.stub_server import StubLLMServer
+
+# Category names for the error messages returned by call_llm, in the order of ERROR_PREFIXES
+ERROR_CATEGORIES = dict(zip(ERROR_PREFIXES, ["llm_error", "unexpected_error"]))
+
+QUERY_TEMPLATES = [
+    "Do you have {item}?",
+    "What is the price of {item}?",
+    "Is {item} in stock?",
+    "Where can I find {item}?",
+    "Do you have {item} and {other}?",
+]
+
+
+def load_queries(file_path):
+    """
+    Load a query log with one query per line.
+
+    Args:
+        file_path (str): Path to the query log.
+
+    Returns:
+        list of str: The non-blank queries in the log.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"The query log '{file_path}' does not exist. Please provide a valid file.")
+
+    with open(file_path, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    if not queries:
+        raise ValueError("The query log is empty. Please ensure it contains at least one query.")
+    return queries
+
+
+def generate_queries(inventory, count, seed=0):
+    """
+    Generate queries about random inventory items, including queries for two items.
+
+    Args:
+        inventory (pd.DataFrame): The inventory DataFrame to draw items from.
+        count (int): The number of queries to generate.
+        seed (int): Seed for the random generator, so runs can be repeated exactly.
+
+    Returns:
+        list of str: The generated queries.
+    """
+    rng = random.Random(seed)
+    items = inventory["item"].tolist()
+    return [
+        rng.choice(QUERY_TEMPLATES).format(item=rng.choice(items), other=rng.choice(items))
+        for _ in range(count)
+    ]
+
+
+def classify_response(response):
+    """
+    Classify a pipeline response as a success or an error category.
+
+    The pipeline reports LLM failures as text instead of raising, so errors are
+    recognised with is_llm_error. The error can follow the routing lines of the
+    response, so every line is checked.
+
+    Args:
+        response (str): The response returned by the pipeline.
+
+    Returns:
+        str or None: The error category, or None if the query succeeded.
+    """
+    for line in response.splitlines():
+        if is_llm_error(line):
+            prefix = next(prefix for prefix in ERROR_PREFIXES if line.startswith(prefix))
+            # Keep only the first part of the message so similar errors are grouped
+            message = line[len(prefix):].strip().split(" {")[0]
+            return f"{ERROR_CATEGORIES.get(prefix, 'error')}: {message[:80]}"
+    return None
+
+
+def percentile(values, pct):
+    """
+    Compute a percentile using the nearest-rank method.
+
+    Args:
+        values (list of float): The measured values.
+        pct (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        float or None: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _timed_call(handler, query, start):
+    """
+    Call the handler and measure the latency from the given start time.
+
+    Returns:
+        tuple: The latency in seconds and the error category, or None on success.
+    """
+    try:
+        error = classify_response(handler(query))
+    except Exception as e:
+        error = f"exception: {type(e).__name__}"
+    return time.perf_counter() - start, error
+
+
+def run_load(handler, queries, concurrency=1, rate=None):
+    """
+    Replay queries against a handler and record the latency and outcome of each.
+
+    Without a rate, the queries are sent by a fixed number of concurrent users, each
+    sending its next query as soon as the previous one is answered. With a rate, the
+    queries are started on a fixed schedule regardless of how long earlier ones take,
+    and latency is measured from the scheduled start so that queueing is included.
+
+    Args:
+        handler (callable): Function that takes a query and returns the pipeline response.
+        queries (list of str): The queries to send.
+        concurrency (int): The number of concurrent users, or the maximum number of
+                           queries in flight when a rate is given.
+        rate (float): Target number of queries started per second. Optional.
+
+    Returns:
+        tuple: A tuple containing:
+               - results (list of tuple): (latency in seconds, error category or None) per query.
+               - elapsed (float): Wall-clock duration of the run in seconds.
+    """
+    if concurrency < 1:
+        raise ValueError("Invalid concurrency: at least one concurrent user is required.")
+
+    results = []
+    run_start = time.perf_counter()
+
+    if rate is None:
+        # Closed loop: each user takes the next query once its previous one is answered
+        lock = threading.Lock()
+        pending = iter(queries)
+
+        def user():
+            while True:
+                with lock:
+                    query = next(pending, None)
+                if query is None:
+                    return
+                result = _timed_call(handler, query, time.perf_counter())
+                with lock:
+                    results.append(result)
+
+        threads = [threading.Thread(target=user) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        # Open loop: start queries on schedule and measure from the scheduled time
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = []
+            for position, query in enumerate(queries):
+                scheduled = run_start + position / rate
+                time.sleep(max(0, scheduled - time.perf_counter()))
+                futures.append(executor.submit(_timed_call, handler, query, scheduled))
+            results = [future.result() for future in futures]
+
+    return results, time.perf_counter() - run_start
+
+
+def summarize(results, elapsed):
+    """
+    Summarise a load test run.
+
+    Args:
+        results (list of tuple): (latency in seconds, error category or None) per query.
+        elapsed (float): Wall-clock duration of the run in seconds.
+
+    Returns:
+        dict: Request and error counts, throughput, latency percentiles in
+              milliseconds and the number of errors per category.
+    """
+    latencies = [latency * 1000 for latency, _ in results]
+    errors = Counter(error for _, error in results if error is not None)
+    return {
+        "requests": len(results),
+        "errors": sum(errors.values()),
+        "elapsed_s": elapsed,
+        "throughput_qps": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+        "error_breakdown": dict(errors.most_common()),
+    }
+
+
+def print_summary(summary):
+    """
+    Print a load test summary in a readable format.
+    """
+    print(f"Requests:   {summary['requests']} ({summary['errors']} errors)")
+    print(f"Duration:   {summary['elapsed_s']:.2f} s")
+    print(f"Throughput: {summary['throughput_qps']:.2f} queries/s")
+    for name, value in summary["latency_ms"].items():
+        print(f"Latency {name}: {value:.1f} ms" if value is not None else f"Latency {name}: n/a")
+    if summary["error_breakdown"]:
+        print("Errors:")
+        for category, count in summary["error_breakdown"].items():
+            print(f"  {count:6d}  {category}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the query pipeline against a local LLM stub server.")
+    parser.add_argument("--queries", help="Query log to replay, one query per line. Queries are generated if omitted.")
+    parser.add_argument("--requests", type=int,
+                        help="Number of queries to send. Defaults to the length of the query log, or 100 generated queries.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent users.")
+    parser.add_argument("--rate", type=float, help="Target queries per second instead of a closed loop.")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Base latency of the stub LLM.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Maximum random latency added by the stub LLM.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of LLM calls failing with a server error.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of LLM calls failing with a rate limit error.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for query generation and the stub server.")
+    parser.add_argument("--json", help="Also write the summary to this JSON file.")
+    args = parser.parse_args(argv)
+
+    # Never reach the network: use the locally cached embedding model only
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    import openai
+    import main as pipeline
+    from modules import embedding
+
+    # Keep the snapshot and new cache entries out of the repository, in a
+    # directory that is removed when the run ends
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as work_directory:
+        # Load the inventory file with a copy of the prebuilt index, so every run
+        # uses the same inventory and never publishes a snapshot into faiss_index/
+        index_path = os.path.join(work_directory, "faiss_index", os.path.basename(pipeline.index_file))
+        os.makedirs(os.path.dirname(index_path))
+        if os.path.exists(pipeline.index_file):
+            shutil.copyfile(pipeline.index_file, index_path)
+        inventory, index, embedding_model = pipeline.load_pipeline(index_path=index_path)
+
+        embedding.embedding_cache_file = os.path.join(work_directory, "embedding_cache.pkl")
+
+        if args.queries:
+            queries = load_queries(args.queries)
+            # Replay the log from the start as many times as needed to reach the request count
+            count = args.requests or len(queries)
+            queries = [queries[i % len(queries)] for i in range(count)]
+        else:
+            queries = generate_queries(inventory, args.requests or 100, args.seed)
+
+        with StubLLMServer(
+            inventory,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            seed=args.seed
+        ) as stub:
+            openai.api_base = stub.url
+            openai.api_key = "stub"
+
+            results, elapsed = run_load(
+                lambda query: pipeline.answer_query(query, inventory, index, embedding_model),
+                queries,
+                concurrency=args.concurrency,
+                rate=args.rate
+            )
+
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    return summary
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,219 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CLARIFICATION_RESPONSE = "Could you please clarify what item you’re looking for? This will help me assist you better."
+
+
+def _find_items(query, departments_by_item):
+    """
+    Find the inventory items mentioned in a query, in the order they appear.
+
+    Longer names are matched first so "apple juice" is not also reported as "apple".
+    """
+    spans = []
+    for item in sorted(departments_by_item, key=len, reverse=True):
+        for match in re.finditer(rf"\b{re.escape(item)}(?:s|es)?\b", query):
+            if not any(match.start() < end and start < match.end() for start, end, _ in spans):
+                spans.append((match.start(), match.end(), item))
+    return [item for _, _, item in sorted(spans)]
+
+
+def stub_reply(prompt, departments_by_item):
+    """
+    Produce a deterministic reply for one of the prompts sent by the query pipeline.
+
+    Args:
+        prompt (str): The user prompt received by the stub.
+        departments_by_item (dict): Maps lowercase item names to their department.
+
+    Returns:
+        str: A reply shaped like the one the real LLM would give for that prompt.
+    """
+    # Query interpretation: return the inventory items mentioned in the query
+    if "the user is asking for" in prompt:
+        query = prompt.rsplit("Query:", 1)[-1].lower()
+        found = _find_items(query, departments_by_item)
+        if not found:
+            return CLARIFICATION_RESPONSE
+        if "every item" in prompt:
+            return ", ".join(found)
+        return found[0]
+
+    # Batched department routing: one 'item: department' line per item
+    match = re.search(r"Items: (.*?)\. Available departments:", prompt)
+    if match:
+        items = [item.strip() for item in match.group(1).split(";")]
+        return "\n".join(f"{item}: {departments_by_item.get(item.lower(), 'general')}" for item in items)
+
+    # Department routing: look the item up in the inventory
+    match = re.search(r"Item: (.*?)\. Available departments:", prompt)
+    if match:
+        item = match.group(1).strip()
+        department = departments_by_item.get(item.lower(), "general")
+        return f'The item "{item}" belongs to the {department} department.'
+
+    # Response generation: summarise the inventory lines from the context
+    found = re.findall(r"- Item: (.*)", prompt)
+    if found:
+        return "Here is what we found: " + "; ".join(line.strip() for line in found)
+
+    return "I'm not sure how to help with that."
+
+
+class StubLLMServer:
+    """
+    Local HTTP server implementing the OpenAI chat completions endpoint for load tests.
+
+    The server answers with deterministic replies after a configurable delay and can
+    inject server errors and rate limit errors at configurable rates. Latency jitter
+    and error injection are seeded per request, keyed by the prompt and how often it
+    has been seen, so they do not depend on the order of concurrent requests.
+    """
+
+    def __init__(self, inventory=None, latency_ms=50, jitter_ms=0, error_rate=0.0,
+                 rate_limit_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        """
+        Args:
+            inventory (pd.DataFrame): Inventory used to answer interpretation and routing prompts.
+            latency_ms (float): Base delay added to every response, in milliseconds.
+            jitter_ms (float): Maximum random delay added on top of the base delay, in milliseconds.
+            error_rate (float): Fraction of requests answered with a 500 server error.
+            rate_limit_rate (float): Fraction of requests answered with a 429 rate limit error.
+            seed (int): Seed for the jitter and error injection.
+            host (str): Address to listen on. Default is the loopback interface.
+            port (int): Port to listen on. Default of 0 picks a free port.
+        """
+        self.departments_by_item = {}
+        if inventory is not None:
+            self.departments_by_item = {
+                str(item).lower(): department
+                for item, department in zip(inventory["item"], inventory["department"])
+            }
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.request_count = 0
+
+        self._prompt_counts = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        str: Base URL to use as the OpenAI API base, e.g. http://127.0.0.1:8000/v1.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server and release its port.
+        """
+        # shutdown() waits for serve_forever, so only call it once serving has started
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _draw(self, prompt):
+        """
+        Draw the delay and injected error for a request.
+
+        The draw comes from a generator seeded with the server seed, the prompt and
+        how many times that prompt has been received. It therefore does not depend on
+        the order in which concurrent requests arrive, and repeated runs inject the
+        same errors and delays.
+
+        Args:
+            prompt (str): The user prompt of the request.
+
+        Returns:
+            tuple: The delay in seconds and the HTTP status to answer with.
+        """
+        with self._lock:
+            self.request_count += 1
+            occurrence = self._prompt_counts.get(prompt, 0)
+            self._prompt_counts[prompt] = occurrence + 1
+
+        rng = random.Random(f"{self.seed}:{occurrence}:{prompt}")
+        delay = (self.latency_ms + rng.uniform(0, self.jitter_ms)) / 1000
+        roll = rng.random()
+
+        if roll < self.error_rate:
+            return delay, 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return delay, 429
+        return delay, 200
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                prompt = body.get("messages", [{}])[-1].get("content", "")
+                delay, status = stub._draw(prompt)
+                time.sleep(delay)
+
+                if status == 500:
+                    self._send(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+                if status == 429:
+                    self._send(429, {"error": {"message": "Injected rate limit error", "type": "rate_limit_error"}})
+                    return
+
+                content = stub_reply(prompt, stub.departments_by_item)
+                self._send(200, {
+                    "id": f"chatcmpl-stub-{stub.request_count}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # Keep load test output free of per-request access logs
+                pass
+
+        return Handler
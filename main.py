@@ -1,75 +1,202 @@
 import os
-import pandas as pd
+import sys
+import argparse
 import pickle
-from modules.inventory import load_inventory
-from modules.query_processing import interpret_query, determine_department, correct_spelling
-from modules.embedding import create_or_load_faiss_index, embed_query, generate_user_response
-from config.config import get_openai_api_key
+from modules.query_processing import interpret_query_items, determine_departments, correct_spelling
+from modules import embedding
+from llm.call_llm import is_llm_error
+from modules.embedding import load_embedding_model, embed_queries, generate_multi_item_response, embedding_cache
+from modules.workers import run_prefork_workers, memory_usage
+from modules.index_manager import IndexManager, load_snapshot
 
-# Step 1: Load the inventory from a CSV file
 inventory_file = "inventory.csv"
-inventory = load_inventory(inventory_file)
-
-# Step 2: Create or load the FAISS index for embedding-based search
-index, embedding_model = create_or_load_faiss_index(inventory, "faiss_index/index.bin")
-
-# Load embedding cache if available
-embedding_cache_file = "embedding_cache.pkl"
-embedding_cache = {}
-if os.path.exists(embedding_cache_file):
-    try:
-        with open(embedding_cache_file, "rb") as f:
-            embedding_cache = pickle.load(f)
-    except (EOFError, pickle.UnpicklingError):
-        print("Warning: Cache file is empty or corrupted. Starting with a fresh cache.")
-        embedding_cache = {}
+# Prebuilt index used for the first snapshot, which is saved next to it
+index_file = "faiss_index/index.bin"
 
-if __name__ == "__main__":
+
+def load_pipeline(use_mmap=False, index_path=index_file):
+    """
+    Load the inventory, the FAISS index and the embedding model used to answer queries.
+
+    Args:
+        use_mmap (bool): Memory-map the FAISS index so that several processes share it.
+        index_path (str): The file path of the prebuilt FAISS index; snapshots are loaded
+                          from and saved next to it. Default is faiss_index/index.bin.
+
+    Returns:
+        tuple: A tuple containing the inventory DataFrame, the FAISS index and the embedding model.
+    """
+    # Step 1: Load the model used to embed queries (and the inventory, if a rebuild is needed)
+    embedding_model = load_embedding_model()
+
+    # Step 2: Load the inventory together with the FAISS index built from it.
+    # Both come from the same saved snapshot, so they always match.
+    inventory, index = load_snapshot(index_path, inventory_file, embedding_model, use_mmap=use_mmap)
+
+    # Load embedding cache if available
+    if os.path.exists(embedding.embedding_cache_file):
+        try:
+            with open(embedding.embedding_cache_file, "rb") as f:
+                embedding_cache.update(pickle.load(f))
+        except (EOFError, pickle.UnpicklingError):
+            print("Warning: Cache file is empty or corrupted. Starting with a fresh cache.")
+
+    return inventory, index, embedding_model
+
+
+def answer_query(user_query, inventory, index, embedding_model, confirm_correction=None):
+    """
+    Run a query through the full pipeline and return the text to show the user.
+
+    Queries asking for several items (e.g. "Do you have bananas and oranges?") are
+    resolved in one pass: all items are routed with one LLM call, embedded together,
+    searched with one FAISS search and answered with a single response.
+
+    Args:
+        user_query (str): The query entered by the user.
+        inventory (pd.DataFrame): The inventory DataFrame.
+        index (faiss.Index): The FAISS index built from the inventory.
+        embedding_model (SentenceTransformer): The embedding model used for queries.
+        confirm_correction (callable): Called with a spelling-corrected item name and returns
+                                       True if the user accepts it. Corrections are accepted
+                                       automatically if not provided.
+
+    Returns:
+        str: The response to display to the user.
+    """
+    # Step 4: Use LLM to interpret the user's query and extract every requested item
+    interpreted_items = interpret_query_items(user_query)
+    if any(is_llm_error(item) for item in interpreted_items):
+        # Stop here instead of treating the error message as an item name
+        return interpreted_items[0]
+    if not interpreted_items:
+        # Prompt user for clarification with examples
+        return "Could you please specify the item you're looking for? For example, you could ask: 'Do you have apples?' or 'Is milk available in the grocery section?' This will help me provide the best assistance."
+
+    # Step 5: Use fuzzy matching to correct any spelling errors in the interpreted items
+    corrected_items = []
+    for interpreted_item in interpreted_items:
+        corrected_item = correct_spelling(interpreted_item, inventory)
+        if corrected_item != interpreted_item and confirm_correction is not None:
+            # Ask user for confirmation of the corrected item
+            if not confirm_correction(corrected_item):
+                # If the user does not confirm, prompt them to rephrase their query
+                return "Please provide more details or rephrase your query."
+        corrected_items.append(corrected_item)
+
+    # Step 6: Determine the department of every corrected item with a single LLM call
+    departments = determine_departments(corrected_items, inventory)
+    llm_errors = [department for department in departments if department and is_llm_error(department)]
+    if llm_errors:
+        # Stop here instead of treating the error message as a department
+        return llm_errors[0]
+    if not all(departments):
+        # If a department cannot be determined, ask the user to refine their query
+        return "Could not determine the department. Please refine your query."
+
+    # Step 7: Embed all items as one batch and retrieve results with a single search
+    query_embeddings = embed_queries(
+        [f"{department} {item}" for department, item in zip(departments, corrected_items)],
+        embedding_model
+    )
+    user_response = generate_multi_item_response(query_embeddings, corrected_items, inventory, index, user_query)
+
+    # Display the departments (optional logging for routing purposes) with the response
+    routing = [f"{item}: {department}" for item, department in zip(corrected_items, departments)]
+    return "\n".join(routing + [user_response])
+
+
+def run_cli(index_manager, embedding_model):
+    """
+    Run the interactive command-line loop.
+
+    Typing 'rebuild' rebuilds the FAISS index from the inventory file in the background.
+    Queries keep using the current inventory and index until the rebuild has finished.
+    """
     while True:
         # Step 3: Capture user query
         user_query = input("Please enter your query below: (or type 'exit' to quit): ")
-        
+
         # Exit condition
         if user_query.lower() == "exit":
             print("Goodbye!")
             break
 
+        # Rebuild the index without stopping the application
+        if user_query.strip().lower() == "rebuild":
+            if index_manager.rebuild_in_background():
+                print("Rebuilding the index in the background.")
+            else:
+                print("An index rebuild is already running.")
+            continue
+
         # Handle blank queries
         if not user_query.strip():
             print("Query cannot be blank. Please enter a valid query.")
             continue
 
-        # Step 4: Use LLM to interpret the user's query
-        interpreted_query = interpret_query(user_query)
-        if "Could you please clarify what item you’re looking for? This will help me assist you better." in interpreted_query:
-            # Prompt user for clarification with examples
-            print("Could you please specify the item you're looking for? For example, you could ask: 'Do you have apples?' or 'Is milk available in the grocery section?' This will help me provide the best assistance.")
-            continue
+        # Take the inventory and index from one snapshot so they always match,
+        # even if a background rebuild swaps in a new snapshot during the query
+        inventory, index = index_manager.snapshot()
 
-        # Step 5: Use fuzzy matching to correct any spelling errors in the interpreted query
-        corrected_item = correct_spelling(interpreted_query, inventory)
-        if corrected_item != interpreted_query:
-            # Ask user for confirmation of the corrected item
-            user_confirmation = input(f"Did you mean: {corrected_item}? (yes/no): ").strip().lower()
-            if user_confirmation != "yes":
-                # If the user does not confirm, prompt them to rephrase their query
-                print("Please provide more details or rephrase your query.")
-                continue
-
-        # Step 6: Determine the department of the corrected item
-        department = determine_department(corrected_item, inventory)
-        if department:
-            # Display the department (optional logging for routing purposes)
-            # print(f"Query routed to this department: {department}")
-            print(department)
+        # Step 8: Display the response generated by the LLM
+        print(answer_query(
+            user_query, inventory, index, embedding_model,
+            confirm_correction=lambda item: input(f"Did you mean: {item}? (yes/no): ").strip().lower() == "yes"
+        ))
+
+
+def format_memory_usage(usage):
+    """
+    Format a memory usage report from modules.workers.memory_usage for display.
+    """
+    return (
+        f"resident {usage['rss_mb']:.1f} MB, proportional {usage['pss_mb']:.1f} MB, "
+        f"shared {usage['shared_mb']:.1f} MB"
+    )
+
+
+def run_workers(inventory, index, embedding_model, num_workers):
+    """
+    Answer the queries read from standard input with pre-forked worker processes.
+
+    The pipeline is loaded once before forking, so the workers start from its memory.
+    Spelling corrections are accepted automatically since there is no user to confirm them.
+    """
+    queries = [line.strip() for line in sys.stdin if line.strip()]
+
+    responses, memory_reports = run_prefork_workers(
+        lambda query: answer_query(query, inventory, index, embedding_model),
+        queries,
+        num_workers
+    )
+
+    for query, response in zip(queries, responses):
+        print(f"Query: {query}\n{response}\n")
+
+    # Report resident, proportional and shared memory per worker
+    for pid, usage in sorted(memory_reports.items()):
+        if usage is None:
+            print(f"Worker {pid}: memory usage not available on this platform.")
         else:
-            # If department cannot be determined, ask the user to refine their query
-            print("Could not determine the department. Please refine your query.")
-            continue
+            print(f"Worker {pid}: {format_memory_usage(usage)}")
+    usage = memory_usage()
+    if usage is not None:
+        print(f"Parent {os.getpid()}: {format_memory_usage(usage)}")
 
-        # Step 7: Generate an embedding for the query and retrieve results
-        query_embedding = embed_query(f"{department} {corrected_item}", embedding_model)
-        user_response = generate_user_response(query_embedding, inventory, index, user_query)
 
-        # Step 8: Display the response generated by the LLM
-        print(user_response)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="General Store Query System")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Answer queries read from standard input with this many pre-forked worker processes.")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map the FAISS index instead of reading it into private memory. "
+                             "The inventory is always loaded into private memory.")
+    args = parser.parse_args()
+
+    inventory, index, embedding_model = load_pipeline(use_mmap=args.mmap)
+
+    if args.workers > 0:
+        run_workers(inventory, index, embedding_model, args.workers)
+    else:
+        run_cli(IndexManager(inventory, index, embedding_model, inventory_file, index_file, use_mmap=args.mmap), embedding_model)
@@ -1,17 +1,123 @@
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import os
 import openai
 from config.config import get_openai_api_key
 from llm.call_llm import call_llm
 import pickle
+import stat
+import tempfile
+import threading
 
 openai.api_key = get_openai_api_key()
 
 # Initialize an in-memory cache for query embeddings
 embedding_cache = {}
 
-def create_or_load_faiss_index(inventory, index_path):
+# File the cache is persisted to, and a lock so concurrent queries do not
+# modify the cache while it is being written
+embedding_cache_file = "embedding_cache.pkl"
+embedding_cache_lock = threading.Lock()
+
+# The process umask, read once at import since it can only be read by changing it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_atomically(path, write):
+    """
+    Write a file so that readers only ever see the old or the new complete version.
+
+    The content is written to a temporary file in the same directory, which is then
+    renamed over the target path. The rename is atomic, so a concurrent reader or
+    another process writing the same file never observes a partially written file.
+
+    Args:
+        path (str): The file path to write.
+        write (callable): Called with the temporary file path; must write the content there.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(temp_path)
+
+        # mkstemp creates the file readable by its owner only. Keep the mode of the
+        # file being replaced, or use the default mode for a new file.
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        # Never leave partial temporary files behind
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_embedding_model():
+    """
+    Load the SentenceTransformer model used to embed the inventory and queries.
+
+    Returns:
+        SentenceTransformer: The embedding model.
+    """
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+
+def read_faiss_index(index_path, use_mmap=False):
+    """
+    Read a FAISS index from a file.
+
+    Args:
+        index_path (str): The file path of the FAISS index.
+        use_mmap (bool): Memory-map the file instead of reading it into private memory.
+                         Processes that map the same file share one copy of its pages.
+
+    Returns:
+        faiss.Index: The FAISS index.
+
+    Raises:
+        RuntimeError: If use_mmap is set and the installed FAISS cannot map the vectors in place.
+    """
+    if use_mmap:
+        # Only IO_FLAG_MMAP_IFC maps the stored vectors directly from the file. The
+        # older IO_FLAG_MMAP copies the vectors of flat indexes into private memory,
+        # so falling back to it would silently share nothing.
+        if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            raise RuntimeError("Memory-mapped loading requires faiss-cpu 1.11.0 or later. Please upgrade faiss-cpu.")
+        return faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+    return faiss.read_index(index_path)
+
+
+def build_faiss_index(inventory, embedding_model):
+    """
+    Embed the inventory and build a FAISS index from the embeddings.
+
+    Args:
+        inventory (pd.DataFrame): The inventory DataFrame containing the 'combined' column with text to embed.
+        embedding_model (SentenceTransformer): The embedding model used to generate embeddings.
+
+    Returns:
+        faiss.Index: The FAISS index holding one vector per inventory row.
+    """
+    # Generate embeddings for the 'combined' column of the inventory.
+    embeddings = embedding_model.encode(inventory['combined'].tolist())
+
+    # Initialize a FAISS index for L2 (Euclidean) distance with the correct embedding dimensions.
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+
+    # Add the generated embeddings to the index.
+    index.add(embeddings)
+    return index
+
+
+def create_or_load_faiss_index(inventory, index_path, use_mmap=False):
     """
     Create or load a FAISS index from the specified path.
 
@@ -19,6 +125,9 @@ def create_or_load_faiss_index(inventory, index_path):
         inventory (pd.DataFrame): The inventory DataFrame containing the 
                                   'combined' column with text to embed.
         index_path (str): The file path where the FAISS index is stored or will be saved.
+        use_mmap (bool): Memory-map an existing index file instead of reading it into
+                         private memory. Processes that map the same file share one copy
+                         of its pages. Default is False.
 
     Returns:
         tuple: A tuple containing:
@@ -26,37 +135,37 @@ def create_or_load_faiss_index(inventory, index_path):
                - embedding_model (SentenceTransformer): The embedding model used to generate embeddings.
     """
     # Load the SentenceTransformer model for generating embeddings.
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Generate embeddings for the 'combined' column of the inventory.
-    embeddings = embedding_model.encode(inventory['combined'].tolist())
+    embedding_model = load_embedding_model()
     
     if os.path.exists(index_path):
         # Check if the FAISS index already exists at the given path.
         # If it exists, load the index from the file.
         #print("Loading FAISS index...")
-        index = faiss.read_index(index_path)
+        index = read_faiss_index(index_path, use_mmap=use_mmap)
     else:
         # If the index does not exist, create a new FAISS index.
         print("Creating new FAISS index...")
         
-        # Initialize a FAISS index for L2 (Euclidean) distance with the correct embedding dimensions.
-        index = faiss.IndexFlatL2(embeddings.shape[1])
-        
-        # Add the generated embeddings to the index.
-        index.add(embeddings)
-        
-        # Ensure the directory for the index file exists.
-        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        # Embed the inventory and add the embeddings to a new index.
+        index = build_faiss_index(inventory, embedding_model)
         
         # Save the created index to the specified path for future use.
-        faiss.write_index(index, index_path)
+        # The write is atomic, so processes building at the same time cannot leave a partial file.
+        write_atomically(index_path, lambda path: faiss.write_index(index, path))
         #print(f"FAISS index saved at {index_path}")
     
     # Return the FAISS index and the embedding model.
     return index, embedding_model
 
 
+def _dump_cache(path):
+    """
+    Pickle the embedding cache to the given path.
+    """
+    with open(path, "wb") as f:
+        pickle.dump(embedding_cache, f)
+
+
 def embed_query(query, embedding_model):
     """
     Generate an embedding for a given query using the specified model.
@@ -82,16 +191,50 @@ def embed_query(query, embedding_model):
     # Generate the embedding using the model
     embedding = embedding_model.encode([query])[0]
     
-    # Store the result in the cache
-    embedding_cache[query] = embedding
+    with embedding_cache_lock:
+        # Store the result in the cache
+        embedding_cache[query] = embedding
 
-    # Save the cache to disk for persistence
-    with open("embedding_cache.pkl", "wb") as f:
-        pickle.dump(embedding_cache, f)
+        # Save the cache to disk for persistence
+        write_atomically(embedding_cache_file, _dump_cache)
 
     return embedding
  
 
+def embed_queries(queries, embedding_model):
+    """
+    Generate embeddings for several queries with a single call to the model.
+    Cached queries are reused and only the missing ones are encoded.
+
+    Args:
+        queries (list of str): The query strings to embed.
+        embedding_model (SentenceTransformer): The embedding model to use.
+
+    Returns:
+        numpy.ndarray: A 2D array with one embedding row per query, in the same order.
+
+    Raises:
+        ValueError: If the list is empty or any query is None or empty.
+    """
+    if not queries or any(not query or not isinstance(query, str) for query in queries):
+        raise ValueError("Invalid queries: Every query must be a non-empty string.")
+
+    # Encode the queries that are not cached yet in one batch
+    missing = [query for query in dict.fromkeys(queries) if query not in embedding_cache]
+    if missing:
+        embeddings = embedding_model.encode(missing)
+
+        with embedding_cache_lock:
+            # Store the results in the cache
+            embedding_cache.update(zip(missing, embeddings))
+
+            # Save the cache to disk once for the whole batch
+            write_atomically(embedding_cache_file, _dump_cache)
+
+    # Stack the embeddings into a query matrix for a single FAISS search
+    return np.vstack([embedding_cache[query] for query in queries]).astype("float32")
+
+
 def find_best_match(query_embedding, inventory, index):
     """
     Find the best match for a query embedding in the inventory.
@@ -131,33 +274,64 @@ def generate_user_response(query_embedding, inventory, index, user_query):
     Returns:
         str: A generated response for the user, or an error message if no matches are found or an exception occurs.
     """
+    # A single query is a batch of one row
+    return generate_multi_item_response(query_embedding.reshape(1, -1), None, inventory, index, user_query)
 
-    # Find top 5 matches from the FAISS index
-    distances, indices = index.search(query_embedding.reshape(1, -1), k=5)
 
-    # Filter matches with a similarity distance below the threshold (1)
-    top_matches = [
-        inventory.iloc[idx] for idx, dist in zip(indices[0], distances[0]) if dist < 1
+def generate_multi_item_response(query_embeddings, items, inventory, index, user_query):
+    """
+    Generate a single user-facing response covering one or several requested items.
+
+    All items are searched with one FAISS search over the stacked query embeddings,
+    and the matches for every item are sent to the LLM in a single prompt.
+
+    Args:
+        query_embeddings (np.ndarray): A 2D array with one query embedding row per item.
+        items (list of str or None): The requested item names, in the same order as the embeddings.
+                                     If None, the matches are not grouped by item.
+        inventory (pd.DataFrame): The inventory DataFrame containing items, departments, prices, and availability.
+        index (faiss.Index): The FAISS index for retrieving top matches based on the query embeddings.
+        user_query (str): The original query provided by the user.
+
+    Returns:
+        str: A generated response for the user, or an error message if no matches are found or an exception occurs.
+    """
+
+    # Find the top 5 matches for every item with a single search
+    distances, indices = index.search(query_embeddings, k=5)
+
+    # Filter matches with a similarity distance below the threshold (1), per item
+    matches_per_item = [
+        [inventory.iloc[idx] for idx, dist in zip(item_indices, item_distances) if dist < 1]
+        for item_indices, item_distances in zip(indices, distances)
     ]
-    
-    # If no suitable matches are found, return an appropriate message
-    if not top_matches:
+
+    # If no suitable matches are found for any item, return an appropriate message
+    if not any(matches_per_item):
         return "Sorry, no matching items found. Please refine your query."
 
-    # Prepare context by formatting the top matches into a readable string
-    context = "\n".join(
-        [
+    # Prepare context by formatting the matches into a readable string,
+    # grouped under the item they were found for when items are given
+    sections = []
+    for position, matches in enumerate(matches_per_item):
+        lines = [
             f"- Item: {match['item']}, Department: {match['department']}, "
-            f"Price: ${match['price']}, Availability: {match['availability']}" 
-            for match in top_matches
+            f"Price: ${match['price']}, Availability: {match['availability']}"
+            for match in matches
         ]
-    )
-    
+        if items is not None:
+            lines = [f"Requested item: {items[position]}"] + (lines or ["- No matching items found."])
+        sections.append("\n".join(lines))
+    context = "\n".join(section for section in sections if section)
+
+    # Ask for every item to be covered when several were requested
+    coverage = "that covers every requested item, " if items is not None and len(items) > 1 else ""
+
     # Construct a prompt for the LLM to generate a response
     prompt = f"""
     You are a helpful assistant. A customer asked the following query: "{user_query}".
     Based on the inventory information below, provide a concise and professional response 
-    without adding any extra prefixes like 'Response:'.
+    {coverage}without adding any extra prefixes like 'Response:'.
 
     Inventory information:
     {context}
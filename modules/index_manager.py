@@ -0,0 +1,278 @@
+import os
+import shutil
+import time
+import threading
+from collections import namedtuple
+import faiss
+from modules.inventory import load_inventory
+from modules.embedding import build_faiss_index, read_faiss_index, write_atomically
+
+# An inventory together with the FAISS index built from it. Queries always read
+# both from the same snapshot, so they never see a mismatched pair.
+PipelineSnapshot = namedtuple("PipelineSnapshot", ["inventory", "index"])
+
+
+# Snapshots are saved in versioned directories next to the index file, and a
+# pointer file names the current one. Replacing the pointer publishes a new
+# inventory and index together in a single rename.
+SNAPSHOT_DIRECTORY = "snapshots"
+POINTER_FILE = "CURRENT"
+
+# Number of published snapshots kept on disk, so processes still loading an
+# older snapshot can finish reading it
+KEEP_SNAPSHOTS = 3
+
+# Seconds after which an unfinished build directory is assumed to be abandoned
+STALE_BUILD_AFTER = 3600
+
+
+def _current_snapshot_path(index_path):
+    """
+    Return the directory of the current snapshot, or None if none was published yet.
+    """
+    directory = os.path.dirname(index_path) or "."
+    try:
+        with open(os.path.join(directory, POINTER_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, SNAPSHOT_DIRECTORY, version) if version else None
+
+
+def save_snapshot(snapshot, index_path):
+    """
+    Save a snapshot in a new versioned directory and publish it as the current one.
+
+    The inventory and index are written to a hidden build directory,
+    which is renamed to its version name once complete. The pointer file is then
+    replaced atomically, so readers see either the old or the new set of files and
+    never a mix of both. Processes saving at the same time each publish a complete
+    snapshot, and the last one to replace the pointer wins.
+
+    Args:
+        snapshot (PipelineSnapshot): The inventory and index to save.
+        index_path (str): The file path of the FAISS index; snapshots are saved next to it.
+
+    Returns:
+        str: The directory of the published snapshot.
+    """
+    directory = os.path.dirname(index_path) or "."
+    snapshots_directory = os.path.join(directory, SNAPSHOT_DIRECTORY)
+    os.makedirs(snapshots_directory, exist_ok=True)
+
+    # Version names sort by creation time and are unique across processes
+    version = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+    build_directory = os.path.join(snapshots_directory, f".build-{version}")
+    os.mkdir(build_directory)
+    try:
+        snapshot.inventory.drop(columns=["combined"]).to_csv(
+            os.path.join(build_directory, "inventory.csv"), index=False
+        )
+        faiss.write_index(snapshot.index, os.path.join(build_directory, "index.bin"))
+
+        snapshot_path = os.path.join(snapshots_directory, version)
+        os.rename(build_directory, snapshot_path)
+    except BaseException:
+        shutil.rmtree(build_directory, ignore_errors=True)
+        raise
+
+    # Publish the snapshot by replacing the pointer in a single rename
+    write_atomically(os.path.join(directory, POINTER_FILE), lambda path: _write_text(path, version))
+
+    _remove_old_snapshots(snapshots_directory, version)
+    return snapshot_path
+
+
+def load_snapshot(index_path, inventory_file, embedding_model, use_mmap=False):
+    """
+    Load the current snapshot, building one from the inventory file if needed.
+
+    The inventory is read from the snapshot directory next to the index, not from the
+    inventory file, so the pair always matches even if the inventory file was edited
+    since the index was built. If no snapshot has been published yet, the first one
+    is made from the inventory file and the prebuilt index at index_path, as long as
+    the index holds one vector per inventory row. Otherwise, or if the saved index
+    does not match its inventory, a snapshot is built from the inventory file.
+
+    Args:
+        index_path (str): The file path of the prebuilt FAISS index; snapshots are saved next to it.
+        inventory_file (str): Path to the inventory CSV file used to build a missing snapshot.
+        embedding_model (SentenceTransformer): The embedding model used to build a missing snapshot.
+        use_mmap (bool): Memory-map the FAISS index so that several processes share it.
+
+    Returns:
+        PipelineSnapshot: The inventory and the FAISS index built from it.
+    """
+    # Retry if the snapshot was removed between reading the pointer and its files
+    for _ in range(3):
+        snapshot_path = _current_snapshot_path(index_path)
+        if snapshot_path is None:
+            break
+        inventory_path = os.path.join(snapshot_path, "inventory.csv")
+        snapshot_index_path = os.path.join(snapshot_path, "index.bin")
+        try:
+            inventory = load_inventory(inventory_path)
+            index = read_faiss_index(snapshot_index_path, use_mmap=use_mmap)
+        except (FileNotFoundError, RuntimeError):
+            # FAISS raises RuntimeError for a missing file. Only retry if the files
+            # were removed in the meantime, and report any other read error.
+            if os.path.exists(inventory_path) and os.path.exists(snapshot_index_path):
+                raise
+            continue
+        if index.ntotal == len(inventory):
+            return PipelineSnapshot(inventory, index)
+        print("Warning: The saved FAISS index does not match its inventory. Rebuilding the index...")
+        break
+    else:
+        print("Warning: The current index snapshot could not be read. Rebuilding the index...")
+
+    inventory = load_inventory(inventory_file)
+    index = None
+    if snapshot_path is None and os.path.exists(index_path):
+        # Seed the first snapshot from the prebuilt index shipped with the inventory
+        index = read_faiss_index(index_path)
+        if index.ntotal != len(inventory):
+            print("Warning: The prebuilt FAISS index does not match the inventory. Rebuilding the index...")
+            index = None
+    if index is None:
+        index = build_faiss_index(inventory, embedding_model)
+    return _save_and_reload(PipelineSnapshot(inventory, index), index_path, use_mmap)
+
+
+def _save_and_reload(snapshot, index_path, use_mmap):
+    """
+    Save a snapshot and return it, with the index mapped from the saved file if use_mmap is set.
+    """
+    snapshot_path = save_snapshot(snapshot, index_path)
+    if use_mmap:
+        # Map the saved file so that other processes share the same pages
+        index = read_faiss_index(os.path.join(snapshot_path, "index.bin"), use_mmap=True)
+        return PipelineSnapshot(snapshot.inventory, index)
+    return snapshot
+
+
+def _write_text(path, text):
+    """
+    Write a string to exactly the given path.
+    """
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _remove_old_snapshots(snapshots_directory, current_version):
+    """
+    Remove all but the most recent snapshots and abandoned build directories.
+    """
+    versions = []
+    for name in os.listdir(snapshots_directory):
+        path = os.path.join(snapshots_directory, name)
+        if name.startswith("."):
+            # Unfinished build directory left behind by a process that died
+            try:
+                if time.time() - os.path.getmtime(path) > STALE_BUILD_AFTER:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+        elif name != current_version and name.split("-", 1)[0].isdigit():
+            versions.append(name)
+
+    # Version names start with a creation timestamp, so the oldest sort first
+    versions.sort(key=lambda name: int(name.split("-", 1)[0]))
+    for name in versions[:max(0, len(versions) - (KEEP_SNAPSHOTS - 1))]:
+        shutil.rmtree(os.path.join(snapshots_directory, name), ignore_errors=True)
+
+
+class IndexManager:
+    """
+    Hold the current pipeline snapshot and rebuild it in the background.
+
+    Readers call snapshot() once per query and use the returned inventory and index
+    for the whole query. A rebuild creates a new snapshot and publishes it by replacing
+    a single reference (read-copy-update), so queries already in flight finish on the
+    old snapshot, which is freed once the last of them drops it.
+    """
+
+    def __init__(self, inventory, index, embedding_model, inventory_file, index_path, use_mmap=False):
+        """
+        Args:
+            inventory (pd.DataFrame): The inventory currently in use.
+            index (faiss.Index): The FAISS index built from that inventory.
+            embedding_model (SentenceTransformer): The embedding model used for rebuilds.
+            inventory_file (str): Path to the inventory CSV file to rebuild from.
+            index_path (str): The file path of the FAISS index; rebuilt snapshots are saved next to it.
+            use_mmap (bool): Memory-map rebuilt indexes from their saved files. Default is False.
+        """
+        self.embedding_model = embedding_model
+        self.inventory_file = inventory_file
+        self.index_path = index_path
+        self.use_mmap = use_mmap
+        self.last_error = None
+
+        self._snapshot = PipelineSnapshot(inventory, index)
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread = None
+
+    def snapshot(self):
+        """
+        Return the current snapshot.
+
+        Returns:
+            PipelineSnapshot: The inventory and index to use for one query.
+        """
+        return self._snapshot
+
+    def rebuild(self):
+        """
+        Rebuild the snapshot from the inventory file, save it and swap it in.
+
+        The current snapshot stays in use until the new one is completely built and saved.
+
+        Returns:
+            PipelineSnapshot: The new snapshot.
+        """
+        inventory = load_inventory(self.inventory_file)
+        snapshot = PipelineSnapshot(inventory, build_faiss_index(inventory, self.embedding_model))
+
+        # Save the snapshot, then map the saved index if the current one is mapped too
+        snapshot = _save_and_reload(snapshot, self.index_path, self.use_mmap)
+
+        # Publish the new snapshot with a single reference assignment
+        self._snapshot = snapshot
+        return snapshot
+
+    def rebuild_in_background(self):
+        """
+        Start a rebuild in a worker thread unless one is already running.
+
+        Errors are stored in last_error and the current snapshot is kept.
+
+        Returns:
+            bool: True if a rebuild was started, False if one was already running.
+        """
+        with self._rebuild_lock:
+            if self.is_rebuilding():
+                return False
+            self._rebuild_thread = threading.Thread(target=self._run_rebuild, daemon=True)
+            self._rebuild_thread.start()
+            return True
+
+    def is_rebuilding(self):
+        """
+        Return True if a background rebuild is running.
+        """
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the running background rebuild, if any, to finish.
+        """
+        if self._rebuild_thread is not None:
+            self._rebuild_thread.join(timeout)
+
+    def _run_rebuild(self):
+        try:
+            self.rebuild()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            print(f"Warning: Index rebuild failed, keeping the current index. {str(e)}")
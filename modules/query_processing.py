@@ -1,11 +1,14 @@
+import re
 from fuzzywuzzy import process
 import openai
 from config.config import get_openai_api_key
-from llm.call_llm import call_llm
+from llm.call_llm import call_llm, is_llm_error
 
 # Set the OpenAI API key using the configuration function
 openai.api_key = get_openai_api_key()
 
+CLARIFICATION_RESPONSE = "Could you please clarify what item you’re looking for? This will help me assist you better."
+
 
 def interpret_query(query):
     """
@@ -21,7 +24,7 @@ def interpret_query(query):
     prompt = (
         f"You are a helpful assistant. Analyze the query and determine the item the user is asking for. "
         f"Only return the item name. If the item cannot be determined, respond with: "
-        f"'Could you please clarify what item you’re looking for? This will help me assist you better.'. Query: {query}"
+        f"'{CLARIFICATION_RESPONSE}'. Query: {query}"
     )
     # Call the LLM to process the prompt and return the result
     return call_llm(prompt)
@@ -69,3 +72,75 @@ def determine_department(item, inventory):
     )
     # Call the LLM to process the prompt and return the department name
     return call_llm(prompt)
+
+
+def interpret_query_items(query):
+    """
+    Use GPT-3.5 Turbo to extract every item the user is asking for.
+
+    Args:
+        query (str): The user's query in natural language, possibly asking for several items.
+
+    Returns:
+        list of str: The interpreted item names, in the order they were asked for.
+                     Empty if no item can be determined.
+    """
+    # Prompt for the LLM to list all items in a single call
+    prompt = (
+        f"You are a helpful assistant. Analyze the query and determine every item the user is asking for. "
+        f"Only return the item names, separated by commas. If no item can be determined, respond with: "
+        f"'{CLARIFICATION_RESPONSE}'. Query: {query}"
+    )
+    response = call_llm(prompt)
+    if is_llm_error(response):
+        # Pass the error on as a single entry instead of splitting it into items
+        return [response]
+    if "Could you please clarify what item you’re looking for?" in response:
+        return []
+
+    # Split the comma-separated list, also accepting one item per line
+    items = [item.strip(" .-'\"") for line in response.splitlines() for item in line.split(",")]
+    return [item for item in items if item]
+
+
+def determine_departments(items, inventory):
+    """
+    Use GPT-3.5 Turbo to determine the departments of several items in a single call.
+
+    Args:
+        items (list of str): The item names whose departments need to be determined.
+        inventory (pd.DataFrame): The inventory DataFrame containing department information.
+
+    Returns:
+        list of str: The department for each item, in the same order as the items.
+    """
+    # Create a comma-separated list of unique departments in the inventory
+    departments = ', '.join(inventory['department'].unique())
+
+    # Prompt for the LLM to route all items at once, one line per item
+    prompt = (
+        f"You are a helpful assistant. Determine which department each of the following items belongs to. "
+        f"Respond with one line per item, in the same order, in the format 'item: department'. "
+        f"Items: {'; '.join(items)}. Available departments: {departments}."
+    )
+    response = call_llm(prompt)
+    if is_llm_error(response):
+        return [response] * len(items)
+
+    # Match every 'item: department' line to its item by name, ignoring list
+    # markers, quotes and case, so extra lines such as an introduction are skipped
+    departments_by_item = {}
+    for line in response.splitlines():
+        if ":" not in line:
+            continue
+        name, department = line.split(":", 1)
+        name = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", name).strip(" *'\"").lower()
+        department = department.strip(" *.'\"")
+        if name and department:
+            departments_by_item.setdefault(name, department)
+
+    # Route only the items missing from the reply separately
+    return [
+        departments_by_item.get(item.strip().lower()) or determine_department(item, inventory)
+        for item in items
+    ]
@@ -0,0 +1,148 @@
+import os
+import queue
+import multiprocessing
+
+# Seconds to wait for a result before checking whether the workers are still alive
+POLL_INTERVAL = 0.5
+
+
+def memory_usage():
+    """
+    Report the resident, proportional and shared memory of the current process.
+
+    Reads /proc/self/smaps_rollup, so the figures are only available on Linux.
+    Shared memory counts every page also mapped by another process, including
+    pages inherited copy-on-write from the parent of a forked worker and any
+    memory-mapped FAISS index. The proportional set size (PSS) divides each shared
+    page between the processes using it, so the PSS of all workers adds up to
+    their real combined memory use.
+
+    Returns:
+        dict or None: A dictionary with 'rss_mb', 'pss_mb' and 'shared_mb' keys, or None
+                      if the information is not available on this platform.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    # Every line looks like "Rss:    1432 kB"
+    sizes_kb = {}
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) >= 2 and fields[0].endswith(":"):
+            sizes_kb[fields[0][:-1]] = int(fields[1])
+
+    return {
+        "rss_mb": sizes_kb.get("Rss", 0) / 1024,
+        "pss_mb": sizes_kb.get("Pss", 0) / 1024,
+        "shared_mb": (sizes_kb.get("Shared_Clean", 0) + sizes_kb.get("Shared_Dirty", 0)) / 1024,
+    }
+
+
+def _worker_loop(handler, task_queue, result_queue):
+    """
+    Process queries from the task queue until a stop sentinel is received.
+
+    Args:
+        handler (callable): Function that takes a query and returns a response.
+        task_queue (multiprocessing.Queue): Queue of (position, query) tuples, ended by None.
+        result_queue (multiprocessing.Queue): Queue receiving results and the final memory report.
+    """
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        position, query = task
+        try:
+            response = handler(query)
+        except Exception as e:
+            # Never let one failing query leave the parent waiting for a result
+            response = f"An unexpected error occurred: {str(e)}"
+        result_queue.put(("result", position, response))
+
+    # Report memory usage once all work for this worker is done
+    result_queue.put(("memory", os.getpid(), memory_usage()))
+
+
+def run_prefork_workers(handler, queries, num_workers):
+    """
+    Answer queries with a pool of worker processes forked from the current process.
+
+    Everything the handler needs (inventory, FAISS index, embedding model) must be
+    loaded before calling this function. The workers are forked afterwards, so they
+    start from the already loaded pages of the parent instead of loading private
+    copies. Pages holding Python objects, such as the inventory, are still copied
+    once a worker uses them, since updating reference counts writes to them.
+
+    Args:
+        handler (callable): Function that takes a query and returns a response.
+        queries (list of str): The queries to answer.
+        num_workers (int): The number of worker processes to fork.
+
+    Returns:
+        tuple: A tuple containing:
+               - responses (list of str): The responses, in the same order as the queries.
+               - memory_reports (dict): Memory usage per worker, keyed by process id.
+
+    Raises:
+        ValueError: If num_workers is less than 1.
+        RuntimeError: If the platform does not support forking processes.
+    """
+    if num_workers < 1:
+        raise ValueError("Invalid number of workers: at least one worker is required.")
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Pre-fork worker mode requires a platform that supports fork.")
+
+    # The fork context copies the parent's memory, so the handler and the
+    # objects it references do not need to be pickled
+    context = multiprocessing.get_context("fork")
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+
+    workers = [
+        context.Process(target=_worker_loop, args=(handler, task_queue, result_queue))
+        for _ in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Queue every query followed by one stop sentinel per worker
+    for position, query in enumerate(queries):
+        task_queue.put((position, query))
+    for _ in workers:
+        task_queue.put(None)
+
+    # Collect one result per query and one memory report per worker. Poll so that
+    # a worker that dies (killed, crashed, os._exit) cannot block the parent forever.
+    responses = [None] * len(queries)
+    memory_reports = {}
+    remaining = len(queries) + num_workers
+    while remaining:
+        try:
+            kind, key, value = result_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            # Once every worker has exited, no more results can arrive
+            if all(worker.exitcode is not None for worker in workers):
+                break
+            continue
+        remaining -= 1
+        if kind == "result":
+            responses[key] = value
+        else:
+            memory_reports[key] = value
+
+    for worker in workers:
+        worker.join()
+
+    # Queries lost with a worker that exited abnormally get an error response
+    exit_codes = ", ".join(str(worker.exitcode) for worker in workers if worker.exitcode != 0)
+    for position, response in enumerate(responses):
+        if response is None:
+            responses[position] = (
+                f"An unexpected error occurred: the worker process exited (exit code {exit_codes}) "
+                f"before answering the query."
+            )
+
+    return responses, memory_reports
@@ -1,6 +1,9 @@
 import unittest
+from types import SimpleNamespace
+from unittest import mock
+import faiss
 import pandas as pd
-from modules.embedding import create_or_load_faiss_index, embed_query, find_best_match
+from modules.embedding import create_or_load_faiss_index, embed_query, embed_queries, find_best_match, read_faiss_index
 from config.config import get_openai_api_key
 
 class TestEmbedding(unittest.TestCase):
@@ -39,6 +42,38 @@ class TestEmbedding(unittest.TestCase):
         # Assert that the embedding model is not None
         self.assertIsNotNone(model)
 
+    def test_create_or_load_faiss_index_mmap(self):
+        """
+        Test whether a memory-mapped FAISS index returns the same results as a regular one.
+
+        Ensures that loading with use_mmap=True gives an index with the same vectors
+        and search results as the index read into private memory.
+        """
+        # Make sure the index file exists, then load it both ways
+        index, model = create_or_load_faiss_index(self.inventory, self.index_path)
+        mmap_index, _ = create_or_load_faiss_index(self.inventory, self.index_path, use_mmap=True)
+
+        # Assert that both indexes hold the same number of vectors
+        self.assertEqual(mmap_index.ntotal, index.ntotal)
+
+        # Assert that both indexes return the same nearest neighbours
+        query_embedding = embed_query("Grocery Banana", model).reshape(1, -1)
+        _, indices = index.search(query_embedding, k=5)
+        _, mmap_indices = mmap_index.search(query_embedding, k=5)
+        self.assertEqual(indices.tolist(), mmap_indices.tolist())
+
+    def test_read_faiss_index_mmap_unsupported(self):
+        """
+        Test if memory-mapped loading fails clearly when FAISS cannot map the vectors in place.
+
+        Older FAISS versions only offer IO_FLAG_MMAP, which copies flat index vectors
+        into private memory, so mapping must not silently fall back to it.
+        """
+        old_faiss = SimpleNamespace(IO_FLAG_MMAP=faiss.IO_FLAG_MMAP, read_index=faiss.read_index)
+        with mock.patch("modules.embedding.faiss", old_faiss):
+            with self.assertRaises(RuntimeError):
+                read_faiss_index(self.index_path, use_mmap=True)
+
     def test_embed_query(self):
         """
         Test if a query is embedded correctly into a vector with the expected shape.
@@ -54,6 +89,30 @@ class TestEmbedding(unittest.TestCase):
         # Assert that the embedding is a 1D vector
         self.assertEqual(len(query_embedding.shape), 1)
 
+    def test_embed_queries(self):
+        """
+        Test if several queries are embedded into one matrix with a row per query.
+
+        This ensures the batch embeddings match the ones produced one query at a time,
+        so the stacked matrix can be searched with a single FAISS call.
+        """
+        # Create or load the FAISS index and embedding model
+        index, model = create_or_load_faiss_index(self.inventory, self.index_path)
+
+        # Embed two sample queries as one batch
+        query_embeddings = embed_queries(["Grocery Banana", "Grocery Orange"], model)
+
+        # Assert that the result is a 2D matrix with one row per query
+        self.assertEqual(query_embeddings.shape, (2, index.d))
+
+        # Assert that every row matches the embedding of the single query
+        self.assertTrue((abs(query_embeddings[1] - embed_query("Grocery Orange", model)) < 1e-5).all())
+
+        # Assert that both items are found with a single search
+        _, indices = index.search(query_embeddings, k=1)
+        matched_items = [self.inventory.iloc[row[0]]["item"].lower() for row in indices]
+        self.assertEqual(matched_items, ["banana", "orange"])
+
     def test_find_best_match(self):
         """
         Test whether the best match for an embedded query is correctly found in the inventory.
@@ -116,5 +175,11 @@ class TestEmbedding(unittest.TestCase):
         with self.assertRaises(ValueError):
             embed_query(123, model)
 
+        # Check for an empty batch and a batch with an empty query
+        with self.assertRaises(ValueError):
+            embed_queries([], model)
+        with self.assertRaises(ValueError):
+            embed_queries(["Grocery Banana", ""], model)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,294 @@
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import faiss
+import numpy as np
+import pandas as pd
+from modules.embedding import read_faiss_index, write_atomically
+from modules.index_manager import IndexManager, PipelineSnapshot, KEEP_SNAPSHOTS, load_snapshot
+
+class FakeEmbeddingModel:
+    """
+    Embedding model returning a fixed vector per text, so tests do not need the real model.
+    """
+
+    def encode(self, texts):
+        return np.array([[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts], dtype="float32")
+
+class TestIndexManager(unittest.TestCase):
+    """
+    Unit tests for atomic index writes, snapshot loading and the background rebuild with snapshot swapping.
+    """
+
+    def setUp(self):
+        """
+        Set up a temporary directory with a small inventory file.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.inventory_file = os.path.join(self.directory, "inventory.csv")
+        self.index_path = os.path.join(self.directory, "faiss_index", "index.bin")
+        self._write_inventory(["banana", "milk"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_inventory(self, items):
+        pd.DataFrame({
+            "department": ["grocery"] * len(items),
+            "item": items,
+            "price": [1.0] * len(items),
+            "availability": ["in stock"] * len(items),
+        }).to_csv(self.inventory_file, index=False)
+
+    def _manager(self):
+        manager = IndexManager(None, None, FakeEmbeddingModel(), self.inventory_file, self.index_path)
+        manager.rebuild()
+        return manager
+
+    def test_write_atomically_failure(self):
+        """
+        Test if a failed write keeps the previous file and leaves no temporary files.
+        """
+        path = os.path.join(self.directory, "data.txt")
+        with open(path, "w") as f:
+            f.write("old")
+
+        def failing_write(temp_path):
+            with open(temp_path, "w") as f:
+                f.write("partial")
+            raise RuntimeError("disk full")
+
+        with self.assertRaises(RuntimeError):
+            write_atomically(path, failing_write)
+
+        with open(path) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith(".tmp")])
+
+    def test_write_atomically_permissions(self):
+        """
+        Test if an atomic write keeps the mode of the replaced file and uses the default mode for new files.
+        """
+        path = os.path.join(self.directory, "data.txt")
+        with open(path, "w") as f:
+            f.write("old")
+        os.chmod(path, 0o644)
+
+        def write(temp_path):
+            with open(temp_path, "w") as f:
+                f.write("new")
+
+        write_atomically(path, write)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+        umask = os.umask(0)
+        os.umask(umask)
+        new_path = os.path.join(self.directory, "new.txt")
+        write_atomically(new_path, write)
+        self.assertEqual(stat.S_IMODE(os.stat(new_path).st_mode), 0o666 & ~umask)
+
+    def test_rebuild_saves_snapshot(self):
+        """
+        Test if a rebuild publishes the index and inventory together.
+
+        Validates:
+        - The index holds one vector per inventory row.
+        - The published snapshot directory holds matching files and no build directory is left behind.
+        """
+        manager = self._manager()
+        snapshot = manager.snapshot()
+        self.assertIsInstance(snapshot, PipelineSnapshot)
+        self.assertEqual(snapshot.index.ntotal, len(snapshot.inventory))
+
+        index_directory = os.path.dirname(self.index_path)
+        with open(os.path.join(index_directory, "CURRENT")) as f:
+            snapshot_path = os.path.join(index_directory, "snapshots", f.read().strip())
+        self.assertEqual(faiss.read_index(os.path.join(snapshot_path, "index.bin")).ntotal, 2)
+        saved_inventory = pd.read_csv(os.path.join(snapshot_path, "inventory.csv"))
+        self.assertEqual(saved_inventory["item"].tolist(), ["banana", "milk"])
+        self.assertEqual(sorted(os.listdir(snapshot_path)), ["index.bin", "inventory.csv"])
+        self.assertFalse([name for name in os.listdir(os.path.dirname(snapshot_path)) if name.startswith(".")])
+
+    def test_rebuild_maps_saved_index(self):
+        """
+        Test if a manager using memory-mapped indexes maps the rebuilt index from its saved file.
+        """
+        manager = IndexManager(None, None, FakeEmbeddingModel(), self.inventory_file, self.index_path, use_mmap=True)
+        with mock.patch("modules.index_manager.read_faiss_index", wraps=read_faiss_index) as read:
+            snapshot = manager.rebuild()
+
+        index_directory = os.path.dirname(self.index_path)
+        with open(os.path.join(index_directory, "CURRENT")) as f:
+            snapshot_path = os.path.join(index_directory, "snapshots", f.read().strip())
+        read.assert_called_once_with(os.path.join(snapshot_path, "index.bin"), use_mmap=True)
+        self.assertIs(manager.snapshot(), snapshot)
+        self.assertEqual(snapshot.index.ntotal, len(snapshot.inventory))
+
+    def test_rebuild_keeps_recent_snapshots(self):
+        """
+        Test if old snapshot directories are removed after several rebuilds.
+        """
+        manager = self._manager()
+        for _ in range(5):
+            manager.rebuild()
+
+        snapshots_directory = os.path.join(os.path.dirname(self.index_path), "snapshots")
+        self.assertEqual(len(os.listdir(snapshots_directory)), KEEP_SNAPSHOTS)
+
+    def test_load_snapshot_pairs_inventory_with_index(self):
+        """
+        Test if load_snapshot returns the saved inventory with its index, not the edited inventory file.
+
+        Validates:
+        - Without a saved snapshot, one is built from the inventory file.
+        - Editing the inventory file does not change the loaded pair until a rebuild.
+        """
+        model = FakeEmbeddingModel()
+        inventory, index = load_snapshot(self.index_path, self.inventory_file, model)
+        self.assertEqual(inventory["item"].tolist(), ["banana", "milk"])
+        self.assertEqual(index.ntotal, 2)
+
+        self._write_inventory(["banana", "milk", "orange"])
+        inventory, index = load_snapshot(self.index_path, self.inventory_file, model, use_mmap=True)
+        self.assertEqual(inventory["item"].tolist(), ["banana", "milk"])
+        self.assertEqual(index.ntotal, 2)
+
+    def test_load_snapshot_seeds_from_prebuilt_index(self):
+        """
+        Test if the first snapshot uses the prebuilt index when it matches the inventory file.
+
+        Validates:
+        - A matching prebuilt index is saved as the first snapshot without embedding the inventory.
+        - A prebuilt index with a different number of rows is replaced by a rebuilt one.
+        """
+        model = FakeEmbeddingModel()
+        index = faiss.IndexFlatL2(3)
+        index.add(model.encode(["grocery banana", "grocery milk"]))
+        os.makedirs(os.path.dirname(self.index_path))
+        faiss.write_index(index, self.index_path)
+
+        with mock.patch.object(model, "encode", side_effect=AssertionError("inventory embedded again")):
+            inventory, index = load_snapshot(self.index_path, self.inventory_file, model)
+        self.assertEqual(inventory["item"].tolist(), ["banana", "milk"])
+        self.assertEqual(index.ntotal, 2)
+        self.assertTrue(os.path.exists(os.path.join(os.path.dirname(self.index_path), "CURRENT")))
+
+        shutil.rmtree(os.path.join(os.path.dirname(self.index_path), "snapshots"))
+        os.remove(os.path.join(os.path.dirname(self.index_path), "CURRENT"))
+        self._write_inventory(["banana", "milk", "orange"])
+        inventory, index = load_snapshot(self.index_path, self.inventory_file, model)
+        self.assertEqual(index.ntotal, 3)
+
+    def test_load_snapshot_rebuilds_mismatched_pair(self):
+        """
+        Test if load_snapshot rebuilds when the saved index does not match its inventory.
+        """
+        model = FakeEmbeddingModel()
+        self._manager()
+
+        # Replace the saved index with one holding a single vector
+        index_directory = os.path.dirname(self.index_path)
+        with open(os.path.join(index_directory, "CURRENT")) as f:
+            snapshot_path = os.path.join(index_directory, "snapshots", f.read().strip())
+        index = faiss.IndexFlatL2(3)
+        index.add(model.encode(["grocery banana"]))
+        faiss.write_index(index, os.path.join(snapshot_path, "index.bin"))
+
+        inventory, index = load_snapshot(self.index_path, self.inventory_file, model)
+        self.assertEqual(index.ntotal, len(inventory))
+
+    def test_load_snapshot_retries_removed_snapshot(self):
+        """
+        Test if load_snapshot reads the new current snapshot when the one it started reading is removed.
+
+        FAISS raises RuntimeError rather than FileNotFoundError for a missing index file.
+        """
+        manager = self._manager()
+        index_directory = os.path.dirname(self.index_path)
+        with open(os.path.join(index_directory, "CURRENT")) as f:
+            old_snapshot_path = os.path.join(index_directory, "snapshots", f.read().strip())
+        read_paths = []
+
+        def read_after_removal(path, use_mmap=False):
+            # Another process publishes a new snapshot and removes the old one
+            # after the inventory was read but before the index is
+            read_paths.append(path)
+            if path.startswith(old_snapshot_path):
+                self._write_inventory(["banana", "milk", "orange"])
+                manager.rebuild()
+                shutil.rmtree(old_snapshot_path)
+            return read_faiss_index(path, use_mmap=use_mmap)
+
+        with mock.patch("modules.index_manager.read_faiss_index", side_effect=read_after_removal):
+            inventory, index = load_snapshot(self.index_path, self.inventory_file, FakeEmbeddingModel())
+
+        self.assertEqual(len(read_paths), 2)
+        self.assertEqual(inventory["item"].tolist(), ["banana", "milk", "orange"])
+        self.assertEqual(index.ntotal, 3)
+
+    def test_background_rebuild_swaps_snapshot(self):
+        """
+        Test if a background rebuild swaps in a new snapshot while the old one stays intact.
+
+        Validates:
+        - A snapshot taken before the rebuild keeps its inventory and index.
+        - The new snapshot has a matching inventory and index.
+        """
+        manager = self._manager()
+        old_snapshot = manager.snapshot()
+
+        self._write_inventory(["banana", "milk", "orange"])
+        self.assertTrue(manager.rebuild_in_background())
+        manager.wait()
+
+        new_snapshot = manager.snapshot()
+        self.assertIsNone(manager.last_error)
+        self.assertEqual(len(old_snapshot.inventory), 2)
+        self.assertEqual(old_snapshot.index.ntotal, 2)
+        self.assertEqual(len(new_snapshot.inventory), 3)
+        self.assertEqual(new_snapshot.index.ntotal, 3)
+
+    def test_snapshots_never_mismatched(self):
+        """
+        Test if readers always see a matching inventory and index during repeated rebuilds.
+        """
+        manager = self._manager()
+        mismatches = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                inventory, index = manager.snapshot()
+                if len(inventory) != index.ntotal:
+                    mismatches.append((len(inventory), index.ntotal))
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for items in (["banana"], ["banana", "milk", "orange"], ["milk"]):
+            self._write_inventory(items)
+            manager.rebuild()
+        stop.set()
+        thread.join()
+
+        self.assertEqual(mismatches, [])
+
+    def test_background_rebuild_failure_keeps_snapshot(self):
+        """
+        Test if a failed rebuild keeps the current snapshot and records the error.
+        """
+        manager = self._manager()
+        old_snapshot = manager.snapshot()
+
+        os.remove(self.inventory_file)
+        manager.rebuild_in_background()
+        manager.wait()
+
+        self.assertIsInstance(manager.last_error, FileNotFoundError)
+        self.assertIs(manager.snapshot(), old_snapshot)
+
+if __name__ == "__main__":
+    unittest.main()
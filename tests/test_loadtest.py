@@ -0,0 +1,135 @@
+import time
+import unittest
+import openai
+import pandas as pd
+from llm.call_llm import call_llm
+from loadtest.stub_server import StubLLMServer, stub_reply, CLARIFICATION_RESPONSE
+from loadtest.load_generator import classify_response, generate_queries, percentile, run_load, summarize
+
+class TestLoadTest(unittest.TestCase):
+    """
+    Unit tests for the load generator and the local LLM stub server.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment by loading the inventory file.
+        """
+        self.inventory = pd.read_csv("inventory.csv")
+        self.departments_by_item = {"banana": "grocery", "apple juice": "grocery", "apple": "grocery"}
+
+    def test_percentile(self):
+        """
+        Test if percentile uses the nearest-rank method and handles empty input.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_classify_response(self):
+        """
+        Test if LLM error messages are grouped into error categories and other responses succeed.
+        """
+        self.assertIsNone(classify_response("Yes, we have bananas in stock."))
+        self.assertEqual(
+            classify_response("An error occurred while processing your request: Injected server error {\"error\": 1}"),
+            "llm_error: Injected server error"
+        )
+        self.assertEqual(
+            classify_response("An unexpected error occurred: timeout"),
+            "unexpected_error: timeout"
+        )
+        self.assertEqual(
+            classify_response("banana: grocery\nAn error occurred while processing your request: Injected rate limit error"),
+            "llm_error: Injected rate limit error"
+        )
+
+    def test_generate_queries_reproducible(self):
+        """
+        Test if generated queries are the same for the same seed and differ for another seed.
+        """
+        queries = generate_queries(self.inventory, 20, seed=1)
+        self.assertEqual(len(queries), 20)
+        self.assertEqual(queries, generate_queries(self.inventory, 20, seed=1))
+        self.assertNotEqual(queries, generate_queries(self.inventory, 20, seed=2))
+
+    def test_stub_reply(self):
+        """
+        Test if the stub answers interpretation and routing prompts from the inventory.
+        """
+        interpret = "Analyze the query and determine the item the user is asking for. Query: Any apple juice?"
+        self.assertEqual(stub_reply(interpret, self.departments_by_item), "apple juice")
+
+        unknown = "Analyze the query and determine the item the user is asking for. Query: What do you sell?"
+        self.assertEqual(stub_reply(unknown, self.departments_by_item), CLARIFICATION_RESPONSE)
+
+        route = "Determine which department the following item belongs to. Item: banana. Available departments: grocery."
+        self.assertIn("grocery", stub_reply(route, self.departments_by_item))
+
+    def test_stub_reply_multiple_items(self):
+        """
+        Test if the stub lists every item of a compound query and routes them in one reply.
+        """
+        interpret = "Analyze the query and determine every item the user is asking for. Query: Bananas and apple juice?"
+        self.assertEqual(stub_reply(interpret, self.departments_by_item), "banana, apple juice")
+
+        route = ("Determine which department each of the following items belongs to. "
+                 "Items: banana; apple juice. Available departments: grocery.")
+        self.assertEqual(stub_reply(route, self.departments_by_item), "banana: grocery\napple juice: grocery")
+
+    def test_stub_server_with_call_llm(self):
+        """
+        Test if call_llm talks to the stub server and receives injected errors as error messages.
+        """
+        original_api_base, original_api_key = openai.api_base, openai.api_key
+        try:
+            with StubLLMServer(self.inventory, latency_ms=0) as stub:
+                openai.api_base, openai.api_key = stub.url, "stub"
+                prompt = "Analyze the query and determine the item the user is asking for. Query: Do you have bananas?"
+                self.assertEqual(call_llm(prompt), "banana")
+
+                stub.error_rate = 1.0
+                self.assertIsNotNone(classify_response(call_llm(prompt)))
+        finally:
+            openai.api_base, openai.api_key = original_api_base, original_api_key
+
+    def test_stub_server_draws_independent_of_order(self):
+        """
+        Test if injected errors depend only on the seed and prompts, not on request order.
+        """
+        prompts = [f"prompt {i % 7}" for i in range(60)]
+
+        def draws(ordered_prompts):
+            stub = StubLLMServer(error_rate=0.3, rate_limit_rate=0.2, seed=3)
+            try:
+                results = {}
+                for prompt in ordered_prompts:
+                    results.setdefault(prompt, []).append(stub._draw(prompt)[1])
+                return results
+            finally:
+                stub.stop()
+
+        self.assertEqual(draws(prompts), draws(list(reversed(prompts))))
+
+    def test_run_load(self):
+        """
+        Test if run_load records one result per query in closed-loop and fixed-rate modes.
+        """
+        def handler(query):
+            time.sleep(0.001)
+            if query == "fail":
+                return "An error occurred while processing your request: boom"
+            return "ok"
+
+        queries = ["ok"] * 9 + ["fail"]
+        for rate in (None, 500):
+            results, elapsed = run_load(handler, queries, concurrency=3, rate=rate)
+            summary = summarize(results, elapsed)
+            self.assertEqual(summary["requests"], 10)
+            self.assertEqual(summary["error_breakdown"], {"llm_error: boom": 1})
+            self.assertGreater(summary["throughput_qps"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import faiss
+import numpy as np
+import pandas as pd
+import main
+from modules import embedding
+from modules.query_processing import interpret_query_items, determine_departments
+
+class KeywordEmbeddingModel:
+    """
+    Embedding model giving every known text its own axis, so exact texts match and all others are far apart.
+    """
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), len(self.texts)), dtype="float32")
+        for row, text in enumerate(texts):
+            if text in self.texts:
+                vectors[row, self.texts.index(text)] = 10.0
+        return vectors
+
+class TestAnswerQuery(unittest.TestCase):
+    """
+    Unit tests for the query pipeline in main.answer_query, with the LLM calls mocked.
+    """
+
+    def setUp(self):
+        """
+        Set up a small inventory, its FAISS index and a temporary embedding cache file.
+        """
+        self.inventory = pd.DataFrame({
+            "department": ["grocery", "grocery", "dairy"],
+            "item": ["banana", "orange", "milk"],
+            "price": [0.79, 0.59, 2.49],
+            "availability": ["in stock", "in stock", "out of stock"],
+        })
+        self.inventory["combined"] = self.inventory["department"] + " " + self.inventory["item"]
+        self.model = KeywordEmbeddingModel(self.inventory["combined"])
+
+        index = faiss.IndexFlatL2(len(self.inventory))
+        index.add(self.model.encode(self.inventory["combined"].tolist()))
+        # Record the searches while still running them on the real index
+        self.index = mock.Mock(wraps=index)
+
+        self.directory = tempfile.mkdtemp()
+        patches = [
+            mock.patch.object(embedding, "embedding_cache_file", os.path.join(self.directory, "embedding_cache.pkl")),
+            mock.patch.dict(embedding.embedding_cache, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_answer_query_multiple_items(self):
+        """
+        Test if a query for two items is answered in a single pass.
+
+        Validates:
+        - Items are extracted with one call and routed with one call.
+        - Both items are searched with one FAISS search over a 2-row matrix.
+        - One response covering both items is generated and shown after the routing lines.
+        """
+        def route_llm(prompt):
+            if "every item the user is asking for" in prompt:
+                return "banana, orange"
+            return "banana: grocery\norange: grocery"
+
+        with mock.patch("modules.query_processing.call_llm", side_effect=route_llm) as routing_call, \
+                mock.patch("modules.embedding.call_llm", return_value="Yes, we have both.") as response_call, \
+                mock.patch("main.interpret_query_items", wraps=interpret_query_items) as interpret, \
+                mock.patch("main.determine_departments", wraps=determine_departments) as route:
+            response = main.answer_query("Do you have bananas and oranges?", self.inventory, self.index, self.model)
+
+        self.assertEqual(response, "banana: grocery\norange: grocery\nYes, we have both.")
+        interpret.assert_called_once()
+        route.assert_called_once()
+        self.assertEqual(routing_call.call_count, 2)
+
+        self.index.search.assert_called_once()
+        query_matrix = self.index.search.call_args[0][0]
+        self.assertEqual(query_matrix.shape, (2, len(self.inventory)))
+
+        response_call.assert_called_once()
+        prompt = response_call.call_args[0][0]
+        self.assertIn("Requested item: banana\n- Item: banana", prompt)
+        self.assertIn("Requested item: orange\n- Item: orange", prompt)
+
+    def test_answer_query_stops_on_llm_error(self):
+        """
+        Test if the pipeline returns the LLM error instead of treating it as an item name.
+
+        Validates:
+        - Only the failing interpretation call is made.
+        - The response is the error message itself.
+        """
+        error = "An error occurred while processing your request: Injected server error"
+        with mock.patch("modules.query_processing.call_llm", return_value=error) as routing_call, \
+                mock.patch("modules.embedding.call_llm") as response_call:
+            response = main.answer_query("Do you have bananas?", self.inventory, self.index, self.model)
+
+        self.assertEqual(response, error)
+        routing_call.assert_called_once()
+        response_call.assert_not_called()
+        self.index.search.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 import pandas as pd
 import re
-from modules.query_processing import interpret_query, correct_spelling, determine_department
+from unittest import mock
+from modules.query_processing import interpret_query, correct_spelling, determine_department, interpret_query_items, determine_departments
 from config.config import get_openai_api_key
 
 class TestQueryProcessing(unittest.TestCase):
@@ -10,6 +11,8 @@ class TestQueryProcessing(unittest.TestCase):
     - interpret_query
     - correct_spelling
     - determine_department
+    - interpret_query_items
+    - determine_departments
     """
 
     def setUp(self):
@@ -128,6 +131,70 @@ class TestQueryProcessing(unittest.TestCase):
         corrected_item = correct_spelling(misspelled_item, self.inventory)
         self.assertIn("banana", corrected_item.lower())  # Substring check for "banana"
 
+    def test_interpret_query_items(self):
+        """
+        Test if interpret_query_items extracts every item from a compound query.
+
+        Validates:
+        - Both 'bananas' and 'oranges' are returned as separate items.
+        """
+        items = interpret_query_items("Do you have bananas and oranges?")
+        self.assertEqual(len(items), 2)
+        self.assertIn("banana", items[0].lower())  # Substring check for "banana"
+        self.assertIn("orange", items[1].lower())  # Substring check for "orange"
+
+    def test_interpret_query_items_no_item(self):
+        """
+        Test if interpret_query_items returns no items when the query names none.
+        """
+        self.assertEqual(interpret_query_items("Hello there!"), [])
+
+    def test_determine_departments(self):
+        """
+        Test if determine_departments routes several items with one result per item.
+
+        Validates:
+        - One department is returned per item, in the same order.
+        """
+        departments = determine_departments(["banana", "laptop charger"], self.inventory)
+        self.assertEqual(len(departments), 2)
+        self.assertIn("grocery", departments[0].lower())  # Check for department name
+        self.assertIn("electronics", departments[1].lower())  # Check for department name
+
+    def test_determine_departments_matches_items_by_name(self):
+        """
+        Test if determine_departments matches reply lines to items by name.
+
+        Validates:
+        - An introduction line and list markers in the reply are ignored.
+        - Lines in a different order are matched to the right item.
+        - Only items missing from the reply are routed separately.
+        """
+        reply = "Here are the departments:\n1. Laptop charger: Electronics\n2. **Banana**: Grocery."
+        with mock.patch("modules.query_processing.call_llm", return_value=reply):
+            departments = determine_departments(["banana", "laptop charger"], self.inventory)
+        self.assertEqual(departments, ["Grocery", "Electronics"])
+
+        with mock.patch("modules.query_processing.call_llm", return_value="banana: grocery"), \
+                mock.patch("modules.query_processing.determine_department", return_value="electronics") as fallback:
+            departments = determine_departments(["banana", "laptop charger"], self.inventory)
+        self.assertEqual(departments, ["grocery", "electronics"])
+        fallback.assert_called_once_with("laptop charger", self.inventory)
+
+    def test_interpret_query_single_item_prompt(self):
+        """
+        Test if interpret_query keeps asking for a single item and returns the reply unchanged.
+
+        Validates:
+        - The prompt asks for the item, not for every item.
+        - The reply is not split into items and joined again.
+        """
+        with mock.patch("modules.query_processing.call_llm", return_value="Banana") as call:
+            result = interpret_query("Do you have bananas?")
+        self.assertEqual(result, "Banana")
+        self.assertIn("determine the item the user is asking for", call.call_args[0][0])
+        self.assertNotIn("every item", call.call_args[0][0])
+
 
 if __name__ == "__main__":
     unittest.main()
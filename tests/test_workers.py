@@ -0,0 +1,73 @@
+import os
+import unittest
+from modules.workers import memory_usage, run_prefork_workers
+
+class TestWorkers(unittest.TestCase):
+    """
+    Unit tests for the pre-fork worker mode and memory reporting.
+    """
+
+    def test_memory_usage(self):
+        """
+        Test if memory_usage reports resident, proportional and shared memory when available.
+
+        Validates:
+        - 'rss_mb', 'pss_mb' and 'shared_mb' are present and non-negative.
+        - Proportional and shared memory do not exceed resident memory.
+        """
+        usage = memory_usage()
+        if usage is None:
+            self.skipTest("Memory usage is not available on this platform.")
+
+        self.assertGreater(usage["rss_mb"], 0)
+        self.assertGreaterEqual(usage["shared_mb"], 0)
+        self.assertLessEqual(usage["shared_mb"], usage["rss_mb"])
+        self.assertGreater(usage["pss_mb"], 0)
+        self.assertLessEqual(usage["pss_mb"], usage["rss_mb"])
+
+    def test_run_prefork_workers(self):
+        """
+        Test if the workers answer every query in order and report their memory.
+
+        Validates:
+        - Responses are returned in the same order as the queries.
+        - One memory report is returned per worker, none of them from the parent.
+        """
+        queries = [f"query {i}" for i in range(10)]
+        responses, memory_reports = run_prefork_workers(str.upper, queries, num_workers=3)
+
+        self.assertEqual(responses, [query.upper() for query in queries])
+        self.assertEqual(len(memory_reports), 3)
+        self.assertNotIn(os.getpid(), memory_reports)
+
+    def test_run_prefork_workers_handler_error(self):
+        """
+        Test if a failing handler produces an error message instead of blocking the parent.
+        """
+        def failing_handler(query):
+            raise RuntimeError("boom")
+
+        responses, _ = run_prefork_workers(failing_handler, ["banana"], num_workers=1)
+        self.assertIn("boom", responses[0])
+
+    def test_run_prefork_workers_worker_exit(self):
+        """
+        Test if a worker that exits without answering produces error responses instead of a hang.
+        """
+        def exiting_handler(query):
+            os._exit(1)
+
+        responses, memory_reports = run_prefork_workers(exiting_handler, ["banana", "milk"], num_workers=2)
+        self.assertEqual(len(responses), 2)
+        self.assertTrue(all("exited" in response for response in responses))
+        self.assertEqual(memory_reports, {})
+
+    def test_run_prefork_workers_invalid_count(self):
+        """
+        Test if run_prefork_workers rejects a worker count below one.
+        """
+        with self.assertRaises(ValueError):
+            run_prefork_workers(str.upper, ["banana"], num_workers=0)
+
+if __name__ == "__main__":
+    unittest.main()